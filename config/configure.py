@@ -9,7 +9,6 @@
 #  - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #
 
-from __future__ import print_function
 import os, sys, time, shutil
 
 def WriteModulesFile(modules,version,sdir):
@@ -49,7 +48,8 @@ def WriteReconfigScript(reconfig,slepcdir,usedargs):
   reconfig.write('import os, sys\n')
   if usedargs:
     reconfig.write('sys.argv.extend(\''+usedargs+'\'.split())\n')
-  reconfig.write('exec(open(os.path.join(\''+slepcdir+'\',\'config\',\'configure.py\')).read())\n')
+  reconfig.write('sys.path.insert(0,os.path.join(\''+slepcdir+'\',\'config\'))\n')
+  reconfig.write('import configure\n')
 
 def ResetConfigureHash(hashfile,log):
   ''' Removes the configure hash file '''
@@ -59,6 +59,18 @@ def ResetConfigureHash(hashfile,log):
   except:
     log.write('Unable to delete configure hash file: '+hashfile)
 
+def PrefetchTarballs(pkgs,externdir,log):
+  ''' Download the tarballs of several packages concurrently '''
+  import concurrent.futures, socket
+  sav_timeout = socket.getdefaulttimeout()
+  socket.setdefaulttimeout(30)
+  try:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pkgs)) as executor:
+      for msg in executor.map(lambda pkg: pkg.Prefetch(externdir),pkgs):
+        if msg: log.write(msg)
+  finally:
+    socket.setdefaulttimeout(sav_timeout)
+
 def Epilog(slepc,petsc):
   print()
   print('xxx'+'='*74+'xxx')
@@ -85,9 +97,10 @@ fixLang('LC_LOCAL')
 fixLang('LANG')
 
 # Set python path
-configdir = os.path.abspath('config')
+cwd = os.getcwd()
+configdir = os.path.join(cwd,'config')
 if not os.path.isdir(configdir):
-  sys.exit('ERROR: Run configure from $SLEPC_DIR, not '+os.path.abspath('.'))
+  sys.exit('ERROR: Run configure from $SLEPC_DIR, not '+cwd)
 sys.path.insert(0,configdir)
 sys.path.insert(0,os.path.join(configdir,'packages'))
 
@@ -108,7 +121,7 @@ if not showhelp:
   log.Print('Checking environment...')
   petsc.InitDir(slepc.prefixdir)
   petsc.LoadVersion()
-slepc.InitDir()
+slepc.InitDir(cwd)
 slepc.LoadVersion()
 
 # Load PETSc configuration
@@ -188,7 +201,7 @@ log.Open(slepc.dir,confdir,'configure.log')
 log.write('='*80)
 log.write('Starting Configure Run at '+time.ctime(time.time()))
 log.write('Configure Options: '+' '.join(sys.argv[1:]))
-log.write('Working directory: '+os.getcwd())
+log.write('Working directory: '+cwd)
 log.write('Python version:\n'+sys.version)
 log.write('make: '+petsc.make)
 
@@ -218,6 +231,11 @@ if archdirexisted:
   except: pass
   if slepc.clean:
     log.Println('\nCleaning arch dir '+archdir+'...')
+    # remove the largest subtrees first, so that they are not walked file by file
+    for rdir in ['obj','externalpackages']:
+      try:
+        shutil.rmtree(os.path.join(archdir,rdir))
+      except: pass
     try:
       for root, dirs, files in os.walk(archdir,topdown=False):
         for name in files:
@@ -225,10 +243,6 @@ if archdirexisted:
             os.remove(os.path.join(root,name))
     except:
       log.Exit('Cannot remove existing files in '+archdir)
-    for rdir in ['obj','externalpackages']:
-      try:
-        shutil.rmtree(os.path.join(archdir,rdir))
-      except: pass
 
 # Generate/check configure hash file
 configurehash = slepc.GetConfigureHash(argdb,petsc)
@@ -252,13 +266,24 @@ else:
     Epilog(slepc,petsc)
     sys.exit(0)
 
+# Download the tarballs of all requested packages at once, they are built one after the other below
+# (this happens before each package's Precondition, which may depend on the packages processed before it)
+downloads = [pkg for pkg in [sowing] + externalwithdeps if pkg.downloadpackage]
+if len(downloads) > 1 and not slepc.downloaddir:
+  PrefetchTarballs(downloads,slepc.GetExternalPackagesDir(archdir),log)
+
+# Reuse link checks from previous runs if requested
+if slepc.checkcache:
+  slepc.OpenCheckCache(confdir,petsc)
+
 # Write main configuration files
 if not slepc.prefixdir:
   slepc.prefixdir = archdir
 includedir = slepc.CreateDir(archdir,'include')
-with slepc.CreateFile(confdir,'slepcvariables') as slepcvars:
-  with slepc.CreateFile(confdir,'slepcrules') as slepcrules:
-    with slepc.CreateFile(includedir,'slepcconf.h') as slepcconf:
+# (contents are kept in memory and each file is written at once at the end)
+with slepc.CreateBufferedFile(confdir,'slepcvariables') as slepcvars:
+  with slepc.CreateBufferedFile(confdir,'slepcrules') as slepcrules:
+    with slepc.CreateBufferedFile(includedir,'slepcconf.h') as slepcconf:
       for pkg in checkpackages:
         pkg.Process(slepcconf,slepcvars,slepcrules,slepc,petsc,archdir)
       slepcconf.write('#define SLEPC_HAVE_PACKAGES ":')
@@ -296,17 +321,22 @@ with slepc.CreateFile(modulesdir,slepc.lversion) as modules:
 # Write pkg-config configuration file
 pkgconfdir = slepc.CreateDir(libdir,'pkgconfig')
 log.write('pkg-config file in '+pkgconfdir)
-for pkfile in ['SLEPc.pc','slepc.pc']:
-  with slepc.CreateFile(pkgconfdir,pkfile) as pkgconfig:
-    WritePkgconfigFile(pkgconfig,slepc.lversion,petsc.version,slepc.dir,slepc.isinstall,slepc.prefixdir,petsc.singlelib)
+with slepc.CreateFile(pkgconfdir,'SLEPc.pc') as pkgconfig:
+  WritePkgconfigFile(pkgconfig,slepc.lversion,petsc.version,slepc.dir,slepc.isinstall,slepc.prefixdir,petsc.singlelib)
+try:
+  shutil.copyfile(os.path.join(pkgconfdir,'SLEPc.pc'),os.path.join(pkgconfdir,'slepc.pc'))
+except shutil.SameFileError: pass  # case-insensitive file system
+except OSError:
+  log.Exit('Cannot create slepc.pc file in '+pkgconfdir)
 
 # Write reconfigure file
 if not slepc.isinstall:
   log.write('Reconfigure file in '+confdir)
-  with slepc.CreateFile(confdir,'reconfigure-'+petsc.archname+'.py') as reconfig:
+  reconfigname = 'reconfigure-'+petsc.archname+'.py'
+  with slepc.CreateFile(confdir,reconfigname) as reconfig:
     WriteReconfigScript(reconfig,slepc.dir,argdb.UsedArgs())
   try:
-    os.chmod(os.path.join(confdir,'reconfigure-'+petsc.archname+'.py'),0o775)
+    os.chmod(os.path.join(confdir,reconfigname),0o775)
   except OSError as e:
     log.Exit('Unable to make reconfigure script executable:\n'+str(e))
 
@@ -8,21 +8,29 @@
 #  - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #
 
-from __future__ import print_function
-import os, sys, tempfile, shutil, tarfile
+import os, sys, tempfile, shutil, atexit, shlex, functools, hashlib, json
 import log, argdb
-from urllib.request import urlretrieve
 from urllib import parse as urlparse_local
 import subprocess
-import socket
 from shutil import which  # just to break compatibility with python2
 
 # Fix parsing for nonstandard schemes
 urlparse_local.uses_netloc.extend(['bk', 'ssh', 'svn'])
 
+@functools.lru_cache(maxsize=None)
+def list_dir(path):
+  '''Return the set of names of entries in path (empty if it cannot be read), cached since many packages search the same install dirs'''
+  try:
+    return frozenset(os.listdir(path))
+  except OSError:
+    return frozenset()
+
 class Package:
 
   packages = []    # list of packages processed and added so far
+  linkdirs = {}    # temporary directories used by Link, indexed by code and compiler options
+  linkmain = None  # result of compiling the main program shared by the default link tests
+  checkcache = None  # results of link checks kept across configure runs, if enabled with OpenCheckCache
 
   def __init__(self,argdb,log):
     self.installable     = False  # an already installed package can be picked --with-xxx-dir
@@ -43,12 +51,16 @@ class Package:
     self.requested       = False
     self.havepackage     = False
 
-  def RunCommand(self,instr):
+  def RunCommand(self,instr,cwd=None):
+    ''' Run a shell command line, or a list of arguments without a shell (optionally within directory cwd) '''
+    shell = isinstance(instr, str)
+    cmdline = instr if shell else ' '.join(shlex.quote(arg) for arg in instr)
+    if cwd: cmdline = 'cd '+cwd+';'+cmdline
     try:
-      self.log.write('- '*35+'\nRunning command:\n'+instr+'\n'+'- '*35)
+      self.log.write('- '*35+'\nRunning command:\n'+cmdline+'\n'+'- '*35)
     except AttributeError: pass
     try:
-      output = subprocess.check_output(instr,shell=True,stderr=subprocess.STDOUT)
+      output = subprocess.check_output(instr,shell=shell,cwd=cwd,stderr=subprocess.STDOUT)
       result = 0
     except subprocess.CalledProcessError as ex:
       output = ex.output
@@ -174,12 +186,12 @@ class Package:
         libs.append(l)
     newldflags = []
     newlibs = []
-    dupflags = ['-L',self.slflag]
+    dupflags = ('-L',self.slflag)
     for j in libs:
       # remove duplicate -L, -Wl,-rpath options - and only consecutive -l options
-      if j in newldflags and any([j.startswith(flg) for flg in dupflags]): continue
+      if j in newldflags and j.startswith(dupflags): continue
       if newlibs and j == newlibs[-1]: continue
-      if list(filter(j.startswith,['-l'])) or list(filter(j.endswith,['.lib','.a','.so','.o'])) or j in ['-Wl,-Bstatic','-Wl,-Bdynamic','-Wl,--start-group','-Wl,--end-group']:
+      if j.startswith('-l') or j.endswith(('.lib','.a','.so','.o')) or j in ('-Wl,-Bstatic','-Wl,-Bdynamic','-Wl,--start-group','-Wl,--end-group'):
         newlibs.append(j)
       else:
         newldflags.append(j)
@@ -220,6 +232,10 @@ class Package:
         return self.packagename+': '+url+' --> '+localFile
 
   def Download(self,externdir,downloaddir):
+    # Modules only needed for downloads are imported here to keep startup fast
+    import socket, tarfile
+    from urllib.request import urlretrieve
+
     # Quick return: check if source is already available
     if os.path.exists(os.path.join(externdir,self.GetDirectoryName())):
       self.log.write('Using '+os.path.join(externdir,self.GetDirectoryName()))
@@ -243,16 +259,19 @@ class Package:
       localFile = os.path.join(externdir,self.GetArchiveName())
       self.log.write('Downloading '+url+' to '+localFile)
 
-      if os.path.exists(localFile):
-        os.remove(localFile)
-      try:
-        sav_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(30)
-        urlretrieve(url, localFile)
-        socket.setdefaulttimeout(sav_timeout)
-      except Exception as e:
-        socket.setdefaulttimeout(sav_timeout)
-        failureMessage = '''\
+      if hasattr(self,'prefetched') and self.prefetched == localFile:
+        self.log.write('Already downloaded together with other packages')
+      else:
+        if os.path.exists(localFile):
+          os.remove(localFile)
+        try:
+          sav_timeout = socket.getdefaulttimeout()
+          socket.setdefaulttimeout(30)
+          urlretrieve(url, localFile)
+          socket.setdefaulttimeout(sav_timeout)
+        except Exception as e:
+          socket.setdefaulttimeout(sav_timeout)
+          failureMessage = '''\
 Unable to download package %s from: %s
 * If URL specified manually - perhaps there is a typo?
 * If your network is disconnected - please reconnect and rerun ./configure
@@ -262,7 +281,7 @@ Unable to download package %s from: %s
   and use the configure option:
   --download-%s=/yourselectedlocation/%s
 ''' % (self.packagename.upper(), url, filename, self.packagename, filename)
-        self.log.Exit(failureMessage)
+          self.log.Exit(failureMessage)
 
     # Uncompress tarball
     extractdir = os.path.join(externdir,self.GetDirectoryName())
@@ -320,6 +339,27 @@ Downloaded package %s from: %s is not a tarball.
       os.remove(localFile)
     return os.path.join(externdir,dirname)
 
+  def Prefetch(self,externdir):
+    '''Download tarball in advance, concurrently with other packages (the returned message is to be logged by the caller)'''
+    from urllib.request import urlretrieve
+    if os.path.exists(os.path.join(externdir,self.GetDirectoryName())):
+      return ''
+    url = self.packageurl
+    if url=='':
+      url = self.url
+    if os.path.exists(url):
+      return ''
+    localFile = os.path.join(externdir,self.GetArchiveName())
+    try:
+      urlretrieve(url, localFile+'.part')
+      os.replace(localFile+'.part', localFile)
+    except Exception as e:
+      try: os.remove(localFile+'.part')
+      except OSError: pass
+      return 'Unable to download '+url+' in advance: '+str(e)
+    self.prefetched = localFile
+    return 'Downloaded '+url+' to '+localFile+' in advance'
+
   wd = 36
 
   def ShowHelp(self):
@@ -356,36 +396,27 @@ Downloaded package %s from: %s is not a tarball.
       else:
         self.log.Println(packagename+' installed')
 
-  def Link(self,functions,callbacks,flags,givencode='',cflags='',clanguage='c',logdump=True):
-
-    # Create temporary directory and makefile
-    try:
-      tmpdir = tempfile.mkdtemp(prefix='slepc-')
-      if not os.path.isdir(tmpdir): os.mkdir(tmpdir)
-    except:
-      self.log.Exit('Cannot create temporary directory')
-    try:
-      with open(os.path.join(tmpdir,'makefile'),'w') as makefile:
-        makefile.write('checklink: checklink.o\n')
-        makefile.write('\t${CLINKER} -o checklink checklink.o ${LINKFLAGS} ${PETSC_SNES_LIB}\n')
-        makefile.write('\t@${RM} -f checklink checklink.o\n')
-        makefile.write('include '+os.path.join('${PETSC_DIR}','lib','petsc','conf','variables')+'\n')
-        makefile.write('include '+os.path.join('${PETSC_DIR}','lib','petsc','conf','rules')+'\n')
-        if cflags:
-          if clanguage=='c++': makefile.write('CXXFLAGS='+cflags+'\n')
-          else: makefile.write('CFLAGS='+cflags+'\n')
-    except:
-      self.log.Exit('Cannot create makefile in temporary directory')
-
-    # Create source file
-    if givencode == '':
+  def LinkCode(self,functions,callbacks):
+    ''' Return the body of the default test program, that calls the given functions from LinkMain '''
+    code = '#if defined(__cplusplus)\nextern "C" {\n#endif\n'
+    for f in functions:
+      code += 'int\n' + f + '();\n'
+
+    for c in callbacks:
+      code += 'int '+ c + '() { return 0; } \n'
+
+    code += 'int checklink_body(void) {\n'
+    for f in functions:
+      code += f + '();\n'
+    code += 'return 0;\n}\n'
+    code += '#if defined(__cplusplus)\n}\n#endif\n'
+    return code
+
+  def LinkMain(self):
+    ''' Compile the main program of the default test program, only once since it includes the PETSc headers '''
+    if Package.linkmain is None:
       code = '#include "petscsnes.h"\n'
-      for f in functions:
-        code += 'PETSC_EXTERN int\n' + f + '();\n'
-
-      for c in callbacks:
-        code += 'int '+ c + '() { return 0; } \n'
-
+      code += 'PETSC_EXTERN int checklink_body(void);\n'
       code += 'int main() {\n'
       code += 'PetscErrorCode ierr; Vec v; Mat m; KSP k;\n'
       code += 'ierr = PetscInitializeNoArguments();\n'
@@ -393,52 +424,169 @@ Downloaded package %s from: %s is not a tarball.
       code += 'ierr = MatCreate(PETSC_COMM_WORLD,&m);\n'
       code += 'ierr = KSPCreate(PETSC_COMM_WORLD,&k);\n'
       code += '(void)ierr;\n'
-      for f in functions:
-        code += f + '();\n'
-      code += 'return 0;\n}\n'
+      code += 'return checklink_body();\n}\n'
+      try:
+        self.log.write('- '*35+'\nCompiling main program of link tests:\n')
+        self.log.write(code)
+      except AttributeError: pass
+      tmpdir = self.LinkDir((('checklink_main',code),),'','c')
+      (result, output) = self.RunCommand(shlex.split(self.make)+['checklink_main.o'],cwd=tmpdir)
+      Package.linkmain = (result, code + output, os.path.join(tmpdir,'checklink_main.o'))
+    return Package.linkmain
+
+  def Link(self,functions,callbacks,flags,givencode='',cflags='',clanguage='c',logdump=True):
+
+    # Create source file, the default code is linked with the precompiled main program
+    if givencode == '':
+      code = self.LinkCode(functions,callbacks)
     else:
       code = givencode
 
-    with open(os.path.join(tmpdir,'checklink.cxx' if clanguage=='c++' else 'checklink.c'),'w') as cfile:
-      cfile.write(code)
     if logdump:
       try:
         self.log.write('- '*35+'\nChecking link with code:\n')
         self.log.write(code)
       except AttributeError: pass
 
-    # Try to compile test program
-    (result, output) = self.RunCommand('cd ' + tmpdir + ';' + self.make + ' checklink LINKFLAGS="'+flags+'"')
-    shutil.rmtree(tmpdir)
+    key = self.CheckCacheKey('link',code,givencode=='',flags,cflags,clanguage)
+    cached = self.GetCachedCheck(key)
+    if cached: return tuple(cached)
+
+    objects = ''
+    if givencode == '':
+      (result, output, objects) = self.LinkMain()
+      if result:
+        return (0,output)
+
+    # Try to compile test program, only the link step is repeated for code that was already compiled
+    tmpdir = self.LinkDir((('checklink',code),),cflags,clanguage,objects)
+    (result, output) = self.RunCommand(shlex.split(self.make)+['checklink','LINKFLAGS='+flags],cwd=tmpdir)
+    self.RemoveExecutable(tmpdir,'checklink')
 
     if result:
-      return (0,code + output)
+      return self.SetCachedCheck(key,(0,code + output))
     else:
-      return (1,code + output)
+      return self.SetCachedCheck(key,(1,code + output))
+
+  def LinkDir(self,sources,cflags,clanguage,objects=''):
+    ''' Return a temporary directory with a makefile and one source file per (target,code) pair in sources '''
+    key = (sources,cflags,clanguage,objects)
+    if key in Package.linkdirs:
+      return Package.linkdirs[key]
+
+    # Create temporary directory and makefile, the object files are kept to be reused
+    try:
+      tmpdir = tempfile.mkdtemp(prefix='slepc-')
+      if not os.path.isdir(tmpdir): os.mkdir(tmpdir)
+    except:
+      self.log.Exit('Cannot create temporary directory')
+    atexit.register(shutil.rmtree,tmpdir,True)
+    try:
+      with open(os.path.join(tmpdir,'makefile'),'w') as makefile:
+        makefile.write('.PHONY: '+' '.join(target for target,code in sources)+'\n')
+        for target,code in sources:
+          makefile.write(target+': '+target+'.o\n')
+          makefile.write('\t${CLINKER} -o '+target+' '+target+'.o '+objects+' ${LINKFLAGS} ${PETSC_SNES_LIB}\n')
+          makefile.write('\t@touch '+target+'.ok\n')  # the executable may get a suffix such as .exe
+        makefile.write('include '+os.path.join('${PETSC_DIR}','lib','petsc','conf','variables')+'\n')
+        makefile.write('include '+os.path.join('${PETSC_DIR}','lib','petsc','conf','rules')+'\n')
+        if cflags:
+          if clanguage=='c++': makefile.write('CXXFLAGS='+cflags+'\n')
+          else: makefile.write('CFLAGS='+cflags+'\n')
+    except:
+      self.log.Exit('Cannot create makefile in temporary directory')
+    for target,code in sources:
+      with open(os.path.join(tmpdir,target+('.cxx' if clanguage=='c++' else '.c')),'w') as cfile:
+        cfile.write(code)
+
+    Package.linkdirs[key] = tmpdir
+    return tmpdir
+
+  def LinkTargets(self,sources,flags,cflags='',clanguage='c',objects='',jobs=''):
+    ''' Try to link every (target,code) pair in sources with a single make call, return which ones succeeded '''
+    key = self.CheckCacheKey('targets',sources,bool(objects),flags,cflags,clanguage)
+    cached = self.GetCachedCheck(key)
+    if cached: return tuple(cached)
+    tmpdir = self.LinkDir(sources,cflags,clanguage,objects)
+    command = shlex.split(self.make) + ['-k'] + (['-j'+jobs] if jobs else []) + [target for target,code in sources]
+    (result, output) = self.RunCommand(command+['LINKFLAGS='+flags],cwd=tmpdir)
+    return self.SetCachedCheck(key,([self.RemoveExecutable(tmpdir,target) for target,code in sources], output))
+
+  def OpenCheckCache(self,confdir,petsc):
+    ''' Enable the cache of link check results, read from and saved at exit to confdir '''
+    Package.checkcachefile = os.path.join(confdir,'toolchain-check-cache.json')
+    # the results are only valid for the same compilers, flags and PETSc configuration
+    Package.checkcachebase = str(petsc) + 'PATH=' + os.environ.get('PATH','') + '\n'
+    try:
+      Package.checkcachebase += 'petscvariables: ' + str(os.stat(petsc.petscvariables).st_mtime) + '\n'
+    except OSError: pass
+    try:
+      with open(Package.checkcachefile) as f:
+        Package.checkcache = json.load(f)
+    except (OSError,ValueError):
+      Package.checkcache = {}
+    atexit.register(self.SaveCheckCache)
+
+  def SaveCheckCache(self):
+    ''' Write the cache of link check results, replacing the previous file at once '''
+    try:
+      with open(Package.checkcachefile+'.tmp','w') as f:
+        json.dump(Package.checkcache,f)
+      os.replace(Package.checkcachefile+'.tmp',Package.checkcachefile)
+    except OSError: pass
+
+  def CheckCacheKey(self,kind,code,usesmain,flags,cflags,clanguage):
+    ''' Return the key of a link check in the cache, or None if the cache is not enabled '''
+    if Package.checkcache is None: return None
+    key = Package.checkcachebase + '\n'.join([kind,repr(code),str(usesmain),flags,cflags,clanguage]) + '\n'
+    # a library directory that was modified may contain a different library now
+    for flag in flags.split():
+      path = flag[2:] if flag.startswith('-L') else flag
+      try:
+        key += path + ': ' + str(os.stat(path).st_mtime) + '\n'
+      except OSError: pass
+    return hashlib.sha256(key.encode()).hexdigest()
+
+  def GetCachedCheck(self,key):
+    if key and key in Package.checkcache:
+      self.log.write('Using result of the same check from a previous configure run')
+      return Package.checkcache[key]
+    return None
+
+  def SetCachedCheck(self,key,value):
+    if key: Package.checkcache[key] = value
+    return value
+
+  def RemoveExecutable(self,tmpdir,target):
+    ''' Remove a linked test program, return whether make succeeded in linking it '''
+    for exe in [target,target+'.exe']:
+      try: os.remove(os.path.join(tmpdir,exe))
+      except OSError: pass
+    try:
+      os.remove(os.path.join(tmpdir,target+'.ok'))
+      return True
+    except OSError:
+      return False
 
   def FortranLink(self,functions,callbacks,flags):
-    f = []
-    for i in functions:
-      f.append(i+'_')
-    c = []
-    for i in callbacks:
-      c.append(i+'_')
-    (result, output1) = self.Link(f,c,flags,logdump=False)
-    output1 = '\n====== With underscore Fortran names\n' + output1
-    if result: return ('UNDERSCORE',output1)
-
-    f = []
-    for i in functions:
-      f.append(i.upper())
-    c = []
-    for i in callbacks:
-      c.append(i.upper())
-    (result, output2) = self.Link(f,c,flags,logdump=False)
-    output2 = '\n====== With capital Fortran names\n' + output2
-    if result: return ('CAPS',output2)
-
-    output = '\n=== With linker flags: '+flags
-    return ('',output + output1 + output2)
+    manglings = [('UNDERSCORE','underscore',lambda s: s+'_'),('CAPS','capital',lambda s: s.upper())]
+
+    # Build the test program for every mangling and try to link all of them with a single make call
+    (result, output, objects) = self.LinkMain()
+    if result:
+      return ('','\n=== With linker flags: '+flags+'\n'+output)
+    sources = tuple(('checklink_'+m.lower(),self.LinkCode([f(i) for i in functions],[f(i) for i in callbacks])) for m,desc,f in manglings)
+    (linked, output) = self.LinkTargets(sources,flags,objects=objects)
+
+    mangling = ''
+    for (m,desc,f),ok in zip(manglings,linked):
+      if ok and not mangling:
+        mangling = m
+    output = ''.join('\n====== With '+desc+' Fortran names\n' + code for (m,desc,f),(target,code) in zip(manglings,sources)) + output
+    if mangling: return (mangling,output)
+
+    output = '\n=== With linker flags: '+flags + output
+    return ('',output)
 
   def GenerateGuesses(self,name,archdir,word='lib'):
     installdirs = [os.path.join(os.path.sep,'usr','local'),os.path.join(os.path.sep,'opt')]
@@ -453,9 +601,8 @@ Downloaded package %s from: %s is not a tarball.
         dirs = dirs + [os.path.join(i,d,word)]
         dirs = dirs + [os.path.join(i,word,d)]
 
-    for d in dirs[:]:
-      if not os.path.exists(d):
-        dirs.remove(d)
+    # list each parent directory once, and check only the candidates found there
+    dirs = [d for d in dirs if os.path.basename(d) in list_dir(os.path.dirname(d)) and os.path.isdir(d)]
     dirs = [''] + dirs + [os.path.join(archdir,word)]
     return dirs
 
@@ -467,21 +614,24 @@ Downloaded package %s from: %s is not a tarball.
       (mangling, output) = self.FortranLink(functions,callbacks,flags)
       error = output
     else:
-      error = ''
+      errors = []
       flags = ''
+      slflag = self.slflag if hasattr(self,'slflag') else ''
       for d in dirs:
+        # the directory part of the flags is the same for all library lists
+        if not d:
+          dirflags = []
+        elif slflag:
+          dirflags = [slflag + d, '-L' + d]
+        else:
+          dirflags = ['-L' + d]
         for l in libs:
-          if d:
-            if hasattr(self,'slflag'):
-              flags = ' '.join([self.slflag + d] + ['-L' + d] + l)
-            else:
-              flags = ' '.join(['-L' + d] + l)
-          else:
-            flags = ' '.join(l)
+          flags = ' '.join(dirflags + l)
           (mangling, output) = self.FortranLink(functions,callbacks,flags)
-          error += output
+          errors.append(output)
           if mangling: break
         if mangling: break
+      error = ''.join(errors)
 
     if mangling:
       self.log.write(output)
@@ -9,7 +9,6 @@
 #
 
 import os,shutil,log,package
-from urllib.request import urlretrieve
 
 class HPDDM(package.Package):
 
@@ -8,7 +8,6 @@
 #  - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #
 
-from __future__ import print_function
 import log, package
 
 class Lapack(package.Package):
@@ -33,7 +32,7 @@ class Lapack(package.Package):
     self.log.NewSection('Checking LAPACK library...')
     self.Check(slepcconf,slepcvars,petsc)
 
-  def LinkBlasLapack(self,functions,callbacks,flags,petsc):
+  def BlasLapackCode(self,functions,petsc):
     code = ''
     for f in functions:
       if petsc.language == 'c++':
@@ -44,6 +43,10 @@ class Lapack(package.Package):
     for f in functions:
       code += f + '();\n'
     code += 'return 0;\n}\n'
+    return code
+
+  def LinkBlasLapack(self,functions,callbacks,flags,petsc):
+    code = self.BlasLapackCode(functions,petsc)
     (result, output) = self.Link(functions,callbacks,flags,code)
     return result
 
@@ -101,11 +104,13 @@ class Lapack(package.Package):
 
     self.log.write('=== Checking all LAPACK functions...')
     if not self.LinkBlasLapack(allf,[],'',petsc):
-      # check functions one by one
+      # check functions one by one, all of them linked by a single parallel make call
+      self.log.write('=== Checking LAPACK functions one by one...')
+      sources = tuple(('checklink_'+i,self.BlasLapackCode([self.Mangle(i)],petsc)) for i in functions)
+      (linked, output) = self.LinkTargets(sources,'',jobs=petsc.make_np)
       self.missing = []
-      for i in functions:
-        self.log.write('=== Checking LAPACK '+i+' function...')
-        if not self.LinkBlasLapack([self.Mangle(i)],[],'',petsc):
+      for i,ok in zip(functions,linked):
+        if not ok:
           self.missing.append(i)
           # some complex functions are represented by their real names
           if i[1:] in namesubst:
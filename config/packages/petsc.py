@@ -220,12 +220,13 @@ class PETSc(package.Package):
       self.log.Exit('Unable to link with PETSc')
     if slepc.isrepo and petsc.isrepo and not petsc.isinstall and petsc.branch!='release' and slepc.branch!='release':
       try:
-        import dateutil.parser, datetime
-        petscdate = dateutil.parser.parse(petsc.gitdate)
-        slepcdate = dateutil.parser.parse(slepc.gitdate)
+        import datetime
+        # dates are in git's default ISO-like format, e.g., 2024-01-15 12:34:56 +0100
+        petscdate = datetime.datetime.strptime(petsc.gitdate,'%Y-%m-%d %H:%M:%S %z')
+        slepcdate = datetime.datetime.strptime(slepc.gitdate,'%Y-%m-%d %H:%M:%S %z')
         if abs(petscdate-slepcdate)>datetime.timedelta(days=30):
           self.log.Warn('Your PETSc and SLEPc repos may not be in sync (more than 30 days apart)')
-      except ImportError: pass
+      except ValueError: pass
 
   def ShowInfo(self):
     self.log.Println('PETSc directory:\n  '+self.dir)
@@ -8,8 +8,7 @@
 #  - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #
 
-from __future__ import print_function
-import argdb, os, sys, package
+import argdb, os, sys, io, contextlib, package
 
 class SLEPc(package.Package):
 
@@ -24,6 +23,8 @@ class SLEPc(package.Package):
     print('  --help, -h'.ljust(wd)+': Display this help and exit')
     print('  --with-clean=<bool>'.ljust(wd)+': Delete prior build files including externalpackages')
     print('  --force=<bool>'.ljust(wd)+': Bypass configure hash caching, and run to completion')
+    print('  --with-toolchain-check-cache=<bool>')
+    print(''.ljust(wd)+': Reuse results of link checks from previous configure runs')
     print('  --with-packages-download-dir=<dir>'.ljust(wd)+': Skip network download of tarballs and locate them in specified dir')
     print('  --with-packages-build-dir=<dir>'.ljust(wd)+': Location to unpack and run the build process for downloaded packages')
     print('\nSLEPc:')
@@ -33,6 +34,7 @@ class SLEPc(package.Package):
   def ProcessArgs(self,argdb):
     self.clean       = argdb.PopBool('with-clean')[0]
     self.force       = argdb.PopBool('force')[0]
+    self.checkcache  = argdb.PopBool('with-toolchain-check-cache')[0]
     self.datadir     = argdb.PopPath('DATAFILESPATH',exist=True)[0]
     self.downloaddir = argdb.PopPath('with-packages-download-dir',exist=True)[0]
     self.pkgbuilddir = argdb.PopPath('with-packages-build-dir',exist=True)[0]
@@ -74,16 +76,18 @@ class SLEPc(package.Package):
     if self.isinstall:
       self.log.Println('SLEPc prefix directory:\n  '+self.prefixdir)
 
-  def InitDir(self):
+  def InitDir(self,cwd=None):
+    if cwd is None:
+      cwd = os.getcwd()
     if 'SLEPC_DIR' in os.environ:
       self.dir = os.path.normpath(os.environ['SLEPC_DIR'])
-      if not os.path.exists(self.dir) or not os.path.exists(os.path.join(self.dir,'config')):
+      if not os.path.isdir(os.path.join(self.dir,'config')):  # also fails if SLEPC_DIR does not exist
         self.log.Exit('SLEPC_DIR environment variable is not valid')
-      if os.path.realpath(os.getcwd()) != os.path.realpath(self.dir):
+      if os.path.realpath(cwd) != os.path.realpath(self.dir):
         self.log.Exit('SLEPC_DIR is not the current directory')
     else:
-      self.dir = os.getcwd()
-      if not os.path.exists(os.path.join(self.dir,'config')):
+      self.dir = cwd
+      if not os.path.isdir(os.path.join(self.dir,'config')):
         self.log.Exit('Current directory is not valid')
 
   def LoadVersion(self):
@@ -142,76 +146,63 @@ class SLEPc(package.Package):
       self.log.Exit('Cannot create '+fname+' file in '+basedir)
     return newfile
 
+  @contextlib.contextmanager
+  def CreateBufferedFile(self,basedir,fname):
+    ''' Return a buffer whose contents replace file basedir/fname at once when the with block ends '''
+    buf = io.StringIO()
+    yield buf
+    newfile = os.path.join(basedir,fname)
+    try:
+      with open(newfile+'.tmp','w') as f:
+        f.write(buf.getvalue())
+      os.replace(newfile+'.tmp',newfile)
+    except:
+      self.log.Exit('Cannot create '+fname+' file in '+basedir)
+
   def CreateDir(self,basedir,dirname):
     ''' Create directory basedir/dirname and return path string '''
     newdir = os.path.join(basedir,dirname)
-    if not os.path.exists(newdir):
-      try:
-        os.mkdir(newdir)
-      except:
-        self.log.Exit('Cannot create '+dirname+' directory: '+newdir)
+    try:
+      os.mkdir(newdir)
+    except FileExistsError:
+      pass
+    except:
+      self.log.Exit('Cannot create '+dirname+' directory: '+newdir)
     return newdir
 
   def CreateDirTwo(self,basedir,dir1,dir2):
     ''' Create directory basedir/dir1/dir2 and return path string '''
-    newbasedir = os.path.join(basedir,dir1)
-    if not os.path.exists(newbasedir):
-      try:
-        os.mkdir(newbasedir)
-      except:
-        self.log.Exit('Cannot create '+dir1+' directory: '+newbasedir)
-    newdir = os.path.join(newbasedir,dir2)
-    if not os.path.exists(newdir):
-      try:
-        os.mkdir(newdir)
-      except:
-        self.log.Exit('Cannot create '+dir2+' directory: '+newdir)
-    return newdir
+    return self.CreateDir(self.CreateDir(basedir,dir1),dir2)
 
   def CreateDirTest(self,basedir,dirname):
     ''' Create directory, return path string and flag indicating if already existed '''
     newdir = os.path.join(basedir,dirname)
-    if not os.path.exists(newdir):
-      existed = False
-      try:
-        os.mkdir(newdir)
-      except:
-        self.log.Exit('Cannot create '+dirname+' directory: '+newdir)
-    else:
+    existed = False
+    try:
+      os.mkdir(newdir)
+    except FileExistsError:
       existed = True
+    except:
+      self.log.Exit('Cannot create '+dirname+' directory: '+newdir)
     return newdir, existed
 
   def CreatePrefixDirs(self,prefixdir):
     ''' Create directories include and lib under prefixdir, and return path strings '''
-    if not os.path.exists(prefixdir):
-      try:
-        os.mkdir(prefixdir)
-      except:
-        self.log.Exit('Cannot create prefix directory: '+prefixdir)
-    incdir = os.path.join(prefixdir,'include')
-    if not os.path.exists(incdir):
-      try:
-        os.mkdir(incdir)
-      except:
-        self.log.Exit('Cannot create include directory: '+incdir)
-    libdir = os.path.join(prefixdir,'lib')
-    if not os.path.exists(libdir):
-      try:
-        os.mkdir(libdir)
-      except:
-        self.log.Exit('Cannot create lib directory: '+libdir)
+    try:
+      os.mkdir(prefixdir)
+    except FileExistsError:
+      pass
+    except:
+      self.log.Exit('Cannot create prefix directory: '+prefixdir)
+    incdir = self.CreateDir(prefixdir,'include')
+    libdir = self.CreateDir(prefixdir,'lib')
     return incdir,libdir
 
   def GetExternalPackagesDir(self,archdir):
     ''' Create externalpackages if needed, unless user specified --with-packages-build-dir '''
     externdir = self.pkgbuilddir
     if not externdir:
-      externdir = os.path.join(archdir,'externalpackages')
-      if not os.path.exists(externdir):
-        try:
-          os.mkdir(externdir)
-        except:
-          self.log.Exit('Cannot create directory: '+externdir)
+      externdir = self.CreateDir(archdir,'externalpackages')
     return externdir
 
   def AddDefine(self,conffile,name,value,prefix='SLEPC_'):
@@ -105,7 +105,7 @@ def query(invDict,fields,labels):
         foundLabel=False   # easy to do if you misspell argument search
         label=label.lower()
         for key in invDict[field]:
-            if fnmatch.filter([key.lower()],label):
+            if fnmatch.fnmatch(key.lower(),label):
               foundLabel=True
               # Do not return values with not unless label itself has not
               if label.startswith('!') and not key.startswith('!'): continue
@@ -127,15 +127,13 @@ def query(invDict,fields,labels):
          for field in ufield.split('|')[1:]:
              i+=1
              label=llist[i]
-             results=results.intersection(set(setlist[i]))
-         allresults+=list(results)
+             results.intersection_update(setlist[i])
+         allresults.extend(results)
        else:
          allresults+=setlist[i]
 
     # remove duplicate entries and sort to give consistent results
-    uniqlist=list(set(allresults))
-    uniqlist.sort()
-    return  uniqlist
+    return sorted(set(allresults))
 
 def get_inverse_dictionary(dataDict,fields,srcdir,petsc_dir):
     """
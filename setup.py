@@ -35,8 +35,7 @@ nonlinear eigenvalue problems
 import sys, os
 from setuptools import setup
 from setuptools.command.install import install as _install
-from distutils.util import get_platform, split_quoted
-from distutils.spawn import find_executable
+from distutils.util import split_quoted
 from distutils import log
 
 init_py = """\
@@ -137,6 +136,7 @@ def build(dry_run=False):
     if dry_run: return
     PETSC_ARCH = get_petsc_arch()
     if PETSC_ARCH: PETSC_ARCH = 'PETSC_ARCH=' + PETSC_ARCH
+    from distutils.spawn import find_executable
     make = find_executable('make')
     command = [make, 'all',
                'PETSC_DIR='+get_petsc_dir(), PETSC_ARCH]
@@ -149,6 +149,7 @@ def install(dry_run=False):
     if dry_run: return
     PETSC_ARCH = get_petsc_arch()
     if PETSC_ARCH: PETSC_ARCH = 'PETSC_ARCH=' + PETSC_ARCH
+    from distutils.spawn import find_executable
     make = find_executable('make')
     command = [make, 'install',
                'PETSC_DIR='+get_petsc_dir(), PETSC_ARCH]
@@ -205,23 +206,26 @@ class cmd_install(_install):
         return outputs
 
 def version():
-    import re
-    version_re = {
-        'major'  : re.compile(r"#define\s+SLEPC_VERSION_MAJOR\s+(\d+)"),
-        'minor'  : re.compile(r"#define\s+SLEPC_VERSION_MINOR\s+(\d+)"),
-        'micro'  : re.compile(r"#define\s+SLEPC_VERSION_SUBMINOR\s+(\d+)"),
-        'release': re.compile(r"#define\s+SLEPC_VERSION_RELEASE\s+(\d+)"),
-        }
+    try:
+        return version.result
+    except AttributeError:
+        pass
+    macros = {}
     slepcversion_h = os.path.join('include','slepcversion.h')
-    data = open(slepcversion_h, 'r').read()
-    major = int(version_re['major'].search(data).groups()[0])
-    minor = int(version_re['minor'].search(data).groups()[0])
-    micro = int(version_re['micro'].search(data).groups()[0])
-    release = int(version_re['release'].search(data).groups()[0])
+    with open(slepcversion_h, 'r') as f:
+        for line in f:
+            l = line.split()
+            if len(l) == 3 and l[0] == '#define':
+                macros[l[1]] = l[2]
+    major = int(macros['SLEPC_VERSION_MAJOR'])
+    minor = int(macros['SLEPC_VERSION_MINOR'])
+    micro = int(macros['SLEPC_VERSION_SUBMINOR'])
+    release = int(macros['SLEPC_VERSION_RELEASE'])
     if release:
         v = "%d.%d.%d" % (major, minor, micro)
     else:
         v = "%d.%d.0.dev%d" % (major, minor+1, 0)
+    version.result = v
     return v
 
 def tarball():
@@ -5,6 +5,7 @@ import os
 import sys
 import glob
 import copy
+import shutil
 import warnings
 
 try:
@@ -155,7 +156,6 @@ def cython_run(
     if not cython_chk(VERSION):
         raise DistutilsError("unsatisfied build requirement '%s'" % require)
     #
-    log.info("cythonizing '%s' -> '%s'", source, target)
     from cythonize import cythonize
     args = []
     if workdir:
@@ -163,15 +163,112 @@ def cython_run(
     args += [source]
     if target:
         args += ['--output-file', target]
+    cache = cython_cache(workdir, alldeps, args)
+    if not force and cache.load(target):
+        log.info("cythonizing '%s' -> '%s' (cached)", source, target)
+        return
+    log.info("cythonizing '%s' -> '%s'", source, target)
     err = cythonize(args)
     if err:
         raise DistutilsError(
             "Cython failure: '%s' -> '%s'" % (source, target)
         )
+    cache.save(target)
+
+
+class cython_cache(object):
+    """Cache of generated C sources, indexed by the contents of the inputs.
+
+    Timestamps of Cython sources change on checkouts and rebases even if
+    their contents do not; in that case the previous output is reused.
+    Only the most recently used entries are kept.
+    """
+
+    keep = 4
+
+    def __init__(self, workdir, depends, args):
+        import hashlib
+        import Cython
+        import cythonize
+        from Cython.Utils import get_cython_cache_dir
+        self.workdir = workdir or os.curdir
+        h = hashlib.sha256()
+        h.update(Cython.__version__.encode())
+        h.update(repr(args).encode())
+        with open(cythonize.__file__, 'rb') as f:
+            h.update(f.read())
+        for dep in sorted(set(depends)):
+            h.update(dep.encode())
+            with open(os.path.join(self.workdir, dep), 'rb') as f:
+                h.update(f.read())
+        self.path = os.path.join(
+            get_cython_cache_dir(), 'cython_run', h.hexdigest()
+        )
+
+    def outputs(self, target):
+        # public and api declarations go to headers next to the C source
+        base = os.path.splitext(target)[0]
+        outputs = [target, base + '.h', base + '_api.h']
+        return [os.path.join(self.workdir, out) for out in outputs]
+
+    def load(self, target):
+        cached = os.path.join(self.path, os.path.basename(target))
+        if not os.path.exists(cached):
+            return False
+        try:
+            for out in self.outputs(target):
+                cached = os.path.join(self.path, os.path.basename(out))
+                if os.path.exists(cached):
+                    shutil.copyfile(cached, out)
+            os.utime(self.path)
+        except OSError:
+            return False
+        return True
+
+    def prune(self):
+        parent = os.path.dirname(self.path)
+        entries = []
+        for name in os.listdir(parent):
+            if name.startswith('tmp'):  # being written by save()
+                continue
+            path = os.path.join(parent, name)
+            entries.append((os.path.getmtime(path), path))
+        entries.sort(reverse=True)
+        for mtime, path in entries[self.keep:]:
+            shutil.rmtree(path, True)
+
+    def save(self, target):
+        import tempfile
+        tmpdir = None
+        try:
+            parent = os.path.dirname(self.path)
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            tmpdir = tempfile.mkdtemp(dir=parent)
+            for out in self.outputs(target):
+                if os.path.exists(out):
+                    shutil.copyfile(out, os.path.join(
+                        tmpdir, os.path.basename(out)))
+            if os.path.isdir(self.path):  # incomplete entry
+                shutil.rmtree(self.path, True)
+            os.rename(tmpdir, self.path)
+            self.prune()
+        except OSError:
+            log.debug("cannot save Cython output to cache '%s'", self.path)
+            if tmpdir:
+                shutil.rmtree(tmpdir, True)
 
 
 # --------------------------------------------------------------------
 
+def makeflags_jobs():
+    """Number of parallel jobs requested to make (-jN) in $MAKEFLAGS."""
+    makeflags = os.environ.get('MAKEFLAGS', '')
+    m = re.search(r'(?:^|\s)-j\s*(\d*)(?:\s|$)', makeflags)
+    if not m:
+        return None
+    return int(m.group(1) or os.cpu_count() or 1)
+
 def fix_config_vars(names, values):
     values = list(values)
     if 'CONDA_BUILD' in os.environ:
@@ -368,6 +465,17 @@ class PetscConfig:
         PLD_FLAGS = PLD_FLAGS.replace('-fvisibility=hidden', '')
         PLD = getenv('PLD', PLD) + ' ' + getenv('PLDFLAGS', PLD_FLAGS)
         PLD_SHARED = str.join(' ', (PLD, ldshared, ldflags))
+        # compiler cache, if available (CCACHE_DISABLE=1 bypasses it)
+        if shutil.which('ccache'):
+            def ccache(cmd):
+                if not cmd: return cmd
+                if os.path.basename(split_quoted(cmd)[0]) == 'ccache':
+                    return cmd
+                return 'ccache ' + cmd
+            os.environ.setdefault('CCACHE_COMPILERCHECK', 'content')
+            PCC = ccache(PCC)
+            PCXX = ccache(PCXX)
+            PCC_SHARED = ccache(PCC_SHARED)
         #
         compiler.set_executables(
             compiler     = PCC,
@@ -595,6 +703,8 @@ class build_ext(_build_ext):
         self._outputs = []
 
     def finalize_options(self):
+        if self.parallel is None:
+            self.parallel = makeflags_jobs()
         _build_ext.finalize_options(self)
         self.set_undefined_options('build', ('inplace', 'inplace'))
         self.set_undefined_options('build',
@@ -644,6 +754,14 @@ class build_ext(_build_ext):
             self.build_temp = build_temp
             self.build_lib  = build_lib
 
+    def _get_ext_arch_path(self, ext, pkgpath, arch):
+        build_lib = self.build_lib
+        try:
+            self.build_lib = os.path.join(build_lib, pkgpath, arch)
+            return self.get_ext_fullpath(ext.name)
+        finally:
+            self.build_lib = build_lib
+
     def get_config_arch(self, arch):
         return config.Configure(self.petsc_dir, arch)
 
@@ -653,6 +771,7 @@ class build_ext(_build_ext):
         petsc_arch = self.petsc_arch
         if not petsc_arch:
             petsc_arch = [ None ]
+        builds = []
         for arch in petsc_arch:
             config = self.get_config_arch(arch)
             ARCH = arch or config['PETSC_ARCH']
@@ -662,8 +781,33 @@ class build_ext(_build_ext):
             ext.language = config.language
             config.log_info()
             pkgpath, newext = self._copy_ext(ext)
-            config.configure(newext, self.compiler)
-            self._build_ext_arch(newext, pkgpath, ARCH)
+            # skip configuring PETSc and the compiler for this arch
+            # if the extension module is newer than all its inputs
+            ext_path = self._get_ext_arch_path(newext, pkgpath, ARCH)
+            depends = newext.sources + newext.depends
+            if not (self.force or
+                    modified.newer_group(depends, ext_path, 'newer')):
+                log.debug("skipping '%s' extension for %s (up-to-date)",
+                          ext.name, ARCH)
+                continue
+            builds.append((config, newext, pkgpath, ARCH))
+        if not self.parallel or len(builds) < 2:
+            for config, newext, pkgpath, ARCH in builds:
+                config.configure(newext, self.compiler)
+                self._build_ext_arch(newext, pkgpath, ARCH)
+            return
+        # build several PETSc architectures concurrently, each
+        # one with its own copy of this command and the compiler
+        def build_arch(build):
+            config, newext, pkgpath, ARCH = build
+            cmd = copy.copy(self)
+            cmd.compiler = copy.deepcopy(self.compiler)
+            config.configure(newext, cmd.compiler)
+            cmd._build_ext_arch(newext, pkgpath, ARCH)
+        from concurrent.futures import ThreadPoolExecutor
+        workers = None if self.parallel is True else self.parallel
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(build_arch, builds))
 
     def run(self):
         self.build_sources()
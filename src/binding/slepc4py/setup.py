@@ -2,7 +2,6 @@
 # Author:  Lisandro Dalcin
 # Contact: dalcinl@gmail.com
 
-import re
 import os
 import sys
 
@@ -46,8 +45,11 @@ def get_version():
         pass
     pkg_init_py = os.path.join(F('{pyname}'), '__init__.py')
     with open(os.path.join(topdir, 'src', pkg_init_py)) as f:
-        m = re.search(r"__version__\s*=\s*'(.*)'", f.read())
-    version = m.groups()[0]
+        for line in f:
+            name, _, value = line.partition('=')
+            if name.strip() == '__version__':
+                version = value.strip().strip('\'"')
+                break
     get_version.result = version
     return version
 
@@ -122,30 +124,56 @@ metadata_extra = {
 # Extension modules
 # --------------------------------------------------------------------
 
+def get_petsc4py_dir():
+    # locate the package without importing it
+    from importlib.util import find_spec
+    spec = find_spec('petsc4py')
+    if spec is not None and spec.submodule_search_locations:
+        return list(spec.submodule_search_locations)[0]
+    return None
+
 def sources():
+    depends = [
+        F('{pyname}/*.pyx'),
+        F('{pyname}/*.pxd'),
+        F('{pyname}/{Name}/*.pyx'),
+        F('{pyname}/{Name}/*.pxd'),
+        F('{pyname}/{Name}/*.pxi'),
+    ]
+    if F('{pyname}') != 'petsc4py':
+        # petsc4py declarations are cimported through sys.path
+        pkgdir = get_petsc4py_dir()
+        if pkgdir is not None:
+            depends += [
+                os.path.join(pkgdir, '*.pxd'),
+                os.path.join(pkgdir, 'include', 'petsc4py', '*.h'),
+            ]
     src = dict(
         source=F('{pyname}/{Name}.pyx'),
-        depends=[
-            F('{pyname}/*.pyx'),
-            F('{pyname}/*.pxd'),
-            F('{pyname}/{Name}/*.pyx'),
-            F('{pyname}/{Name}/*.pxd'),
-            F('{pyname}/{Name}/*.pxi'),
-        ],
+        depends=depends,
         workdir='src',
     )
     return [src]
 
+def _collect_depends(srcdir='src'):
+    suffixes = ('.h', '.c', '.pyx', '.pxd', '.pxi')
+    depends = []
+    def scan(path):
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    scan(entry.path)
+                elif entry.name.endswith(suffixes):
+                    depends.append(entry.path)
+    scan(srcdir)
+    return depends
+
 def extensions():
-    from os import walk
     from glob import glob
     from os.path import join
     #
-    depends = []
+    depends = _collect_depends()
     glob_join = lambda *args: glob(join(*args))
-    for pth, dirs, files in walk('src'):
-        depends += glob_join(pth, '*.h')
-        depends += glob_join(pth, '*.c')
     for pkg in map(str.lower, reversed(PLIST)):
         if (pkg.upper()+'_DIR') in os.environ:
             pd = os.environ[pkg.upper()+'_DIR']
@@ -166,16 +194,27 @@ def extensions():
             numpy_includes = []
     include_dirs.extend(numpy_includes)
     if F('{pyname}') != 'petsc4py':
-        try:
-            import petsc4py
-            petsc4py_includes = [petsc4py.get_include()]
-        except ImportError:
-            petsc4py_includes = []
+        petsc4py_include = os.environ.get('PETSC4PY_INCLUDE')
+        if petsc4py_include is not None:
+            petsc4py_includes = [petsc4py_include]
+        else:
+            pkgdir = get_petsc4py_dir()
+            if pkgdir is not None:
+                petsc4py_includes = [join(pkgdir, 'include')]
+            else:
+                petsc4py_includes = []
         include_dirs.extend(petsc4py_includes)
+        for pth in petsc4py_includes:
+            depends += glob_join(pth, 'petsc4py', '*.h')
+    #
+    ext_sources = []
+    for src in sources():
+        target = os.path.splitext(src['source'])[0] + '.c'
+        ext_sources.append(join(src['workdir'], target))
     #
     ext = dict(
         name=F('{pyname}.lib.{Name}'),
-        sources=[F('src/{pyname}/{Name}.c')],
+        sources=ext_sources,
         depends=depends,
         include_dirs=[
             'src',
@@ -189,6 +228,22 @@ def extensions():
     )
     return [ext]
 
+def package_data():
+    incdir = F('include/{pyname}')
+    pkgdir = os.path.join(topdir, 'src', F('{pyname}'))
+    data = [
+        F('{Name}.pxd'),
+        F('{Name}*.h'),  # generated by Cython
+    ]
+    with os.scandir(os.path.join(pkgdir, incdir)) as it:
+        for entry in sorted(it, key=lambda entry: entry.name):
+            if entry.name.endswith(('.h', '.i')):
+                data.append('/'.join([incdir, entry.name]))
+    return {
+        F('{pyname}'): data,
+        F('{pyname}.lib'): [F('{name}.cfg')],
+    }
+
 # --------------------------------------------------------------------
 # Setup
 # --------------------------------------------------------------------
@@ -201,10 +256,13 @@ def get_release():
     rootdir = os.path.abspath(os.path.join(topdir, *[os.path.pardir]*3))
     version_h = os.path.join(rootdir, 'include', F('{name}version.h'))
     release_macro = '%s_VERSION_RELEASE' % F('{name}').upper()
-    version_re = re.compile(r"#define\s+%s\s+([-]*\d+)" % release_macro)
     if os.path.exists(version_h) and os.path.isfile(version_h):
         with open(version_h, 'r') as f:
-            release = int(version_re.search(f.read()).groups()[0])
+            for line in f:
+                l = line.split()
+                if len(l) == 3 and l[:2] == ['#define', release_macro]:
+                    release = int(l[2])
+                    break
     return bool(release)
 
 def requires(pkgname, major, minor, release=True):
@@ -214,6 +272,29 @@ def requires(pkgname, major, minor, release=True):
     vmax = "%s.%s" % (major, minor + 1)
     return "%s>=%s,<%s" % (pkgname, vmin, vmax)
 
+def metadata_only(args=None):
+    """Return whether setup.py was invoked just to query metadata"""
+    metadata_commands = {
+        'egg_info', 'dist_info', 'check', 'clean',
+        '--name', '--version', '--fullname',
+    }
+    # options of the metadata commands taking a separate value
+    value_options = {
+        '--egg-base', '-e', '--tag-build', '-b', '--output-dir', '-o',
+        '--build-base', '--build-lib', '--build-temp', '-t',
+        '--build-scripts', '--bdist-base', '--command-packages',
+    }
+    if args is None:
+        args = sys.argv[1:]
+    commands = set()
+    args = iter(args)
+    for arg in args:
+        if arg in value_options:
+            next(args, None)
+        elif arg in metadata_commands or not arg.startswith('-'):
+            commands.add(arg)
+    return bool(commands) and commands <= metadata_commands
+
 def run_setup():
     setup_args = metadata.copy()
     vstr = setup_args['version'].split('.')[:2]
@@ -241,21 +322,11 @@ def run_setup():
             F('{pyname}.lib'),
         ],
         package_dir={'' : 'src'},
-        package_data={
-            F('{pyname}'): [
-                F('{Name}.pxd'),
-                F('{Name}*.h'),
-                F('include/{pyname}/*.h'),
-                F('include/{pyname}/*.i'),
-            ],
-            F('{pyname}.lib'): [
-                F('{name}.cfg'),
-            ],
-        },
+        package_data=package_data(),
         cython_sources=[
             src for src in sources()
         ],
-        ext_modules=[
+        ext_modules=[] if metadata_only() else [
             conf.Extension(**ext) for ext in extensions()
         ],
         **setup_args